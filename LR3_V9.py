@@ -1,4 +1,5 @@
-import sys
+import re
+from functools import lru_cache
 from math import log2
 from typing import List, Dict, Optional, Tuple, Set, Union
 # ------------------------------------------------------------
@@ -222,6 +223,10 @@ INSTRUCTION_VARIANTS = {
 # ------------------------------------------------------------
 # Парсинг операндов
 # ------------------------------------------------------------
+# Операнд: [Rn] | [число] | [прочее] | Rn | число | метка (или ошибка)
+_OPERAND_RE = re.compile(r'\[(?:R(\d+)|(\d+)|(.*))\]|R(\d+)|(\d+)|(.*)')
+
+@lru_cache(maxsize=1024)
 def parse_operand(token: str) -> Tuple[str, Union[int, str]]:
     """
     Преобразует текстовое представление операнда в типизированное значение.
@@ -232,39 +237,40 @@ def parse_operand(token: str) -> Tuple[str, Union[int, str]]:
       - целое число           → ('IMM', значение)
       - слово (идентификатор) → ('LABEL', имя_метки)
     В случае ошибки генерирует ValueError.
+    Разбор выполняется одним регулярным выражением, результат кэшируется
+    (операнды разбираются заново на каждой стадии конвейера).
     """
     token = token.upper()
-    # Косвенная адресация: [что-то]
-    if token.startswith('[') and token.endswith(']'):
-        inner = token[1:-1]
-        # [Rreg]
-        if inner.startswith('R') and inner[1:].isdigit():
-            reg = int(inner[1:])
-            if 0 <= reg < NUM_REGS:
-                return ('REG_IND', reg)
-            raise ValueError(f"Недопустимый регистр {inner}")
-        # [адрес]
-        if inner.isdigit():
-            addr = int(inner)
-            if 0 <= addr < MEM_SIZE:
-                return ('MEM', addr)
-            raise ValueError(f"Адрес памяти {addr} вне диапазона (0-{MEM_SIZE-1})")
-        raise ValueError(f"Неверный адрес памяти: {inner}")
+    reg_ind, mem_addr, mem_other, reg, imm, label = _OPERAND_RE.fullmatch(token).groups()
+    # Косвенная адресация: [Rreg]
+    if reg_ind is not None:
+        reg_num = int(reg_ind)
+        if reg_num < NUM_REGS:
+            return ('REG_IND', reg_num)
+        raise ValueError(f"Недопустимый регистр R{reg_ind}")
+    # [адрес]
+    if mem_addr is not None:
+        addr = int(mem_addr)
+        if addr < MEM_SIZE:
+            return ('MEM', addr)
+        raise ValueError(f"Адрес памяти {addr} вне диапазона (0-{MEM_SIZE-1})")
+    if mem_other is not None:
+        raise ValueError(f"Неверный адрес памяти: {mem_other}")
     # Прямой регистр
-    if token.startswith('R') and token[1:].isdigit():
-        reg = int(token[1:])
-        if 0 <= reg < NUM_REGS:
-            return ('REG', reg)
+    if reg is not None:
+        reg_num = int(reg)
+        if reg_num < NUM_REGS:
+            return ('REG', reg_num)
         raise ValueError(f"Недопустимый регистр {token}")
     # Непосредственное значение (только положительные десятичные числа, 0-65535)
-    if token.isdigit():
-        value = int(token)
-        if 0 <= value <= 65535:
+    if imm is not None:
+        value = int(imm)
+        if value <= 65535:
             return ('IMM', value)
         raise ValueError(f"Число {value} выходит за пределы 16 бит (0-65535)")
     # Метка (идентификатор, начинающийся с буквы)
-    if token and token[0].isalpha():
-        return ('LABEL', token)
+    if label and label[0].isalpha():
+        return ('LABEL', label)
     raise ValueError(f"Неверный операнд: {token}")
 # ------------------------------------------------------------
 # Класс Instruction – представление одной инструкции
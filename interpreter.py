@@ -1,34 +1,289 @@
+import argparse
+import json
+import os
+import re
 import sys
+from array import array
+from functools import lru_cache
 from typing import List, Tuple, Union
 
+try:
+    import numpy as np
+    from numba import njit
+except ImportError:  # Без numba выполнение идет только через интерпретатор на Python
+    np = None
+    njit = None
+
+# Коды операций внутреннего представления (индексы в таблице обработчиков)
+OP_HLT = 0
+OP_NOP = 1
+OP_JMP = 2
+OP_JZ = 3
+OP_JNZ = 4
+OP_MOV_RR = 5    # MOV R <- R
+OP_MOV_RI = 6    # MOV R <- число
+OP_MOV_RM = 7    # MOV R <- [адрес]
+OP_MOV_RMR = 8   # MOV R <- [R]
+OP_MOV_MR = 9    # MOV [адрес] <- R
+OP_MOV_MRR = 10  # MOV [R] <- R
+OP_MOV_MRI = 11  # MOV [R] <- число
+OP_CMP = 12
+OP_ADD = 13
+OP_SUB = 14
+OP_MUL = 15
+OP_DIV = 16
+OP_MOD = 17
+# Суперинструкции (только при SimpleAssembler.optimize)
+OP_MOV2 = 18      # MOV R <- число; MOV R <- число
+OP_JMP_HLT = 19   # JMP на метку, за которой стоит HLT
+
+# Простые команды: мнемоника -> код операции
+SIMPLE_OPCODES = {
+    'HLT': OP_HLT, 'NOP': OP_NOP,
+    'JMP': OP_JMP, 'JZ': OP_JZ, 'JNZ': OP_JNZ,
+    'CMP': OP_CMP,
+    'ADD': OP_ADD, 'SUB': OP_SUB, 'MUL': OP_MUL, 'DIV': OP_DIV, 'MOD': OP_MOD,
+}
+
+# MOV: (тип приемника, тип источника) -> код операции
+MOV_OPCODES = {
+    ('reg', 'reg'): OP_MOV_RR,
+    ('reg', 'imm'): OP_MOV_RI,
+    ('reg', 'mem'): OP_MOV_RM,
+    ('reg', 'mem_reg'): OP_MOV_RMR,
+    ('mem', 'reg'): OP_MOV_MR,
+    ('mem_reg', 'reg'): OP_MOV_MRR,
+    ('mem_reg', 'imm'): OP_MOV_MRI,
+}
+
+# Латентность многотактных команд (остальные по умолчанию 1)
+LATENCY = {OP_MUL: 4, OP_DIV: 4, OP_MOD: 4, OP_MOV2: 2, OP_JMP_HLT: 2}
+
+# Количество исходных инструкций в суперинструкции (остальные - 1)
+FUSED_SIZE = {OP_MOV2: 2, OP_JMP_HLT: 2}
+
+def _tokenize(line: str) -> List[str]:
+    """Токены строки без комментария (всё после '#')"""
+    return line.split('#', 1)[0].split()
+
+# Операнд: [Rn] | [число] | [прочее] | R0-R7 | число | метка (или ошибка)
+_OPERAND_RE = re.compile(r'\[(?:R(\d)|(\d+)|(.*))\]|R([0-7])|(\d+)|(.*)')
+
+@lru_cache(maxsize=1024)
+def _classify_operand(token: str) -> Tuple[str, Union[int, str]]:
+    """Разбор операнда одним регулярным выражением (см. SimpleAssembler.parse_operand)"""
+    mem_reg, mem_addr, mem_other, reg, imm, label = _OPERAND_RE.fullmatch(token).groups()
+    if reg is not None:
+        return ('reg', int(reg))
+    if imm is not None:
+        value = int(imm)
+        # Проверка на 16-битное беззнаковое число
+        if value <= 65535:
+            return ('imm', value)
+        raise ValueError(f"Число {value} выходит за пределы 16 бит (0-65535)")
+    if mem_reg is not None:
+        reg_num = int(mem_reg)
+        if reg_num <= 7:
+            return ('mem_reg', reg_num)
+        raise ValueError(f"Недопустимый регистр R{mem_reg}")
+    if mem_addr is not None:
+        addr = int(mem_addr)
+        if addr <= 255:
+            return ('mem', addr)
+        raise ValueError(f"Адрес памяти {addr} вне диапазона (0-255)")
+    if mem_other is not None:
+        raise ValueError(f"Неверный адрес памяти: {mem_other}")
+    # Если не регистр, не число и не память, считаем меткой (R8, R9 - тоже метки)
+    if label and label[0].isalpha():
+        return ('label', label)
+    raise ValueError(f"Неверный операнд: {token}")
+
+# Размер буфера трассировки, после которого он выводится, не дожидаясь конца программы
+TRACE_FLUSH_LINES = 10000
+
+# Кэш результатов компиляции: в памяти процесса и в файле рядом с исходником
+COMPILE_CACHE_SUFFIX = '.asm-cache.json'
+COMPILE_CACHE_VERSION = 3  # увеличить при изменении формата внутреннего представления
+_COMPILE_CACHE = {}  # (путь, mtime_ns, размер) -> (строк, метки, инструкции, программа)
+
+# Число аргументов каждой операции во внутреннем представлении (см. decode_instruction)
+ARG_COUNT = [0, 0, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 2, 3, 3, 3, 3, 3]
+
+def _is_valid_program(program: list) -> bool:
+    """Проверка программы из файла кэша: коды операций, аргументы и адреса переходов"""
+    for op, args in program:
+        if not 0 <= op <= OP_MOD or len(args) != ARG_COUNT[op]:
+            return False
+        if op in (OP_JMP, OP_JZ, OP_JNZ):
+            target, label = args
+            if type(target) is not int or not 0 <= target <= len(program) or type(label) is not str:
+                return False
+        elif any(type(arg) is not int for arg in args):
+            return False
+    return True
+
+# Коды завершения _run_program
+RUN_STOPPED = 0       # HLT или останов по переполнению
+RUN_PC_OVERFLOW = 1   # счетчик команд вышел за пределы программы
+RUN_DIV_ZERO = 2      # DIV: деление на ноль
+RUN_MOD_ZERO = 3      # MOD: деление на ноль
+RUN_BAD_ADDRESS = 4   # адрес памяти из регистра вне диапазона
+
+# Тексты ошибок выполнения (общие для обработчиков и _run_program)
+DIV_ZERO_MESSAGE = "Деление на ноль"
+MOD_ZERO_MESSAGE = "MOD: деление на ноль"
+
+def _run_program(opcodes, arg0, arg1, arg2, latency, regs, mem, max_steps):
+    """
+    Цикл выполнения над программой в виде целочисленных массивов
+    (код операции и до трех операндов на инструкцию; latency - такты по коду операции).
+    Семантика совпадает с обработчиками SimpleAssembler._op_*.
+    Возвращает (код_завершения, pc, выполнено_инструкций, тактов, флаг_Z).
+    """
+    n = len(opcodes)
+    n_mem = len(mem)
+    pc = 0
+    executed = 0
+    cycles = 0
+    z = False
+    status = RUN_STOPPED
+    while executed < max_steps:
+        if pc >= n:
+            status = RUN_PC_OVERFLOW
+            break
+        op = opcodes[pc]
+        x = arg0[pc]
+        y = arg1[pc]
+        w = arg2[pc]
+        next_pc = pc + 1
+        running = True
+        if op == OP_HLT:
+            running = False
+        elif op == OP_NOP:
+            pass
+        elif op == OP_JMP:
+            next_pc = x
+        elif op == OP_JZ:
+            if z:
+                next_pc = x
+        elif op == OP_JNZ:
+            if not z:
+                next_pc = x
+        elif op == OP_MOV_RR:
+            regs[x] = regs[y]
+        elif op == OP_MOV_RI:
+            regs[x] = y
+        elif op == OP_MOV_RM:
+            regs[x] = mem[y]
+        elif op == OP_MOV_RMR:
+            addr = regs[y]
+            if addr < -n_mem or addr >= n_mem:
+                status = RUN_BAD_ADDRESS
+                break
+            regs[x] = mem[addr]
+        elif op == OP_MOV_MR:
+            mem[x] = regs[y]
+        elif op == OP_MOV_MRR:
+            addr = regs[x]
+            if addr < -n_mem or addr >= n_mem:
+                status = RUN_BAD_ADDRESS
+                break
+            mem[addr] = regs[y]
+        elif op == OP_MOV_MRI:
+            addr = regs[x]
+            if addr < -n_mem or addr >= n_mem:
+                status = RUN_BAD_ADDRESS
+                break
+            mem[addr] = y
+        elif op == OP_CMP:
+            z = regs[x] == regs[y]
+        else:
+            # Арифметика: ADD/SUB/MUL/DIV/MOD Rx Ry Rw
+            val1 = regs[y]
+            val2 = regs[w]
+            result = 0
+            if op == OP_ADD:
+                if 0xFFFF - val1 < val2 or (-0xFFFF+1-val1) > val2:
+                    running = False
+                else:
+                    result = val1 + val2
+            elif op == OP_SUB:
+                if val1 < (val2-0xFFFF+1) or (0xFFFF+val2) < val1:
+                    running = False
+                else:
+                    result = val1 - val2
+            elif op == OP_MUL:
+                if val2 != 0 and ((0xFFFF // val2) < val1 or (val1 < ((-0xFFFF+1) // val2))):
+                    running = False
+                else:
+                    result = val1 * val2
+            elif op == OP_DIV:
+                if val2 == 0:
+                    status = RUN_DIV_ZERO
+                    break
+                if val1 == -0xFFFF+1 and val2 == -1:
+                    running = False
+                else:
+                    result = val1 // val2
+            else:
+                if val2 == 0:
+                    status = RUN_MOD_ZERO
+                    break
+                result = val1 % val2
+            regs[x] = result
+            if result <= 0:
+                z = True
+        pc = next_pc
+        executed += 1
+        cycles += latency[op]
+        if not running:
+            break
+    return status, pc, executed, cycles, z
+
+# JIT-компиляция цикла выполнения (кэш машинного кода сохраняется между запусками)
+_run_native = njit(cache=True)(_run_program) if njit is not None else None
+
 class SimpleAssembler:
     """Простой интерпретатор псевдо-ассемблера"""
 
-    def __init__(self):
+    def __init__(self, max_steps: int = 10_000_000):
         # Состояние вычислительной системы
         self.pc = 0  # Счетчик команд
-        self.registers = [0] * 8  # 8 регистров R0-R7
-        self.memory = [0] * 256  # Память данных (256 ячеек)
+        # Регистры и память хранятся как массивы C int (значения могут быть отрицательными)
+        self.registers = array('i', [0] * 8)  # 8 регистров R0-R7
+        self.memory = array('i', [0] * 256)  # Память данных (256 ячеек)
         self.running = False  # Флаг выполнения программы
         self.z_flag = False  # Флаг нуля (Z)
+        self.trace = False  # Пошаговый вывод выполнения (--trace)
+        self.optimize = False  # Слияние инструкций в суперинструкции (--optimize)
+        self.use_cache = True  # Кэширование результата компиляции (--no-cache)
+        self._trace = []  # Буфер строк трассировки
+        # Лимит выполненных инструкций - защита от зацикливания (--max-steps)
+        self.max_steps = max_steps
 
         # Внутреннее представление программы
-        self.lines = []  # Исходные строки
+        self.line_count = 0  # Количество строк в файле программы
+        self.stmts = []  # Непустые строки без комментариев: (номер_строки, токены)
         self.instructions = []  # Распарсенные инструкции
+        self.program = []  # Декодированные инструкции: (код_операции, операнды)
+        self.native_program = None  # Та же программа в массивах numpy (для _run_native)
         self.labels = {}  # Метки: {имя_метки: адрес}
 
-        # Таблица допустимых команд
-        self.valid_instructions = {
-            'HLT', 'NOP', 'JMP', 'JZ', 'JNZ',  # Управление
-            'MOV', 'CMP',                       # Пересылки
-            'ADD', 'SUB', 'MUL', 'DIV', 'MOD'    # Арифметика
-        }
-
     def load_program(self, filename: str) -> bool:
         """Загрузка программы из файла"""
         try:
+            # Файл читается построчно и сразу разбивается на токены: исходные строки
+            # целиком не хранятся, оба прохода используют готовый результат.
+            # Пустые строки и строки из одних комментариев отбрасываются сразу
+            stmts = []
+            line_count = 0
             with open(filename, 'r', encoding='utf-8') as file:
-                self.lines = [line.upper() for line in file.readlines()]
+                for line_count, line in enumerate(file, 1):
+                    parts = _tokenize(line.upper())
+                    if parts:
+                        stmts.append((line_count, parts))
+            self.stmts = stmts
+            self.line_count = line_count
             return True
         except FileNotFoundError:
             print(f"Ошибка: Файл '{filename}' не найден")
@@ -37,12 +292,6 @@ class SimpleAssembler:
             print(f"Ошибка при чтении файла: {e}")
             return False
 
-    def remove_comments(self, line: str) -> str:
-        """Удаление комментариев из строки"""
-        if '#' in line:
-            line = line[:line.index('#')]
-        return line.strip()
-
     def parse_operand(self, token: str) -> Tuple[str, Union[int, str]]:
         """
         Парсинг операнда.
@@ -51,62 +300,16 @@ class SimpleAssembler:
         - ('imm', число) для констант (только положительные десятичные)
         - ('mem', адрес) для [адрес]
         - ('label', имя_метки) для меток
+        Токены уже приведены к верхнему регистру в load_program.
         """
-        token = token.upper()
-        # Проверка на память [адрес] или [регистр]
-        if token.startswith('[') and token.endswith(']'):
-            addr_token = token[1:-1]
-            # Если внутри регистр вида R0-R7
-            if addr_token.startswith('R') and len(addr_token) == 2 and addr_token[1].isdigit():
-                reg_num = int(addr_token[1])
-                if 0 <= reg_num <= 7:
-                    return ('mem_reg', reg_num)
-                else:
-                    raise ValueError(f"Недопустимый регистр {addr_token}")
-            # Иначе пытаемся как число
-            elif addr_token.isdigit():
-                addr = int(addr_token)
-                if 0 <= addr <= 255:
-                    return ('mem', addr)
-                else:
-                    raise ValueError(f"Адрес памяти {addr} вне диапазона (0-255)")
-            else:
-                raise ValueError(f"Неверный адрес памяти: {addr_token}")
-
-        # Проверка на регистр (только R0-R7)
-        if token.startswith('R') and len(token) == 2:  # Только R0..R7
-            if token[1].isdigit():
-                reg_num = int(token[1])
-                if 0 <= reg_num <= 7:
-                    return ('reg', reg_num)
-                # R8, R9 - метки (продолжаем проверку)
-
-        # Проверка на число (только положительные десятичные)
-        if token.isdigit():  # Только цифры, без минуса
-            value = int(token)
-
-            # Проверка на 16-битное беззнаковое число
-            if 0 <= value <= 65535:
-                return ('imm', value)
-            else:
-                raise ValueError(f"Число {value} выходит за пределы 16 бит (0-65535)")
-
-        # Если не регистр, не число и не память, считаем меткой
-        if token and token[0].isalpha():
-            return ('label', token)
-        else:
-            raise ValueError(f"Неверный операнд: {token}")
+        return _classify_operand(token)
 
     def first_pass(self) -> bool:
         """Первый проход: сбор меток и проверка синтаксиса"""
         address = 0
         error_count = 0
-        for i, raw_line in enumerate(self.lines, 1):
-            line = self.remove_comments(raw_line)
-            if not line:
-                continue
-            parts = line.split()
-
+        validators = self.VALIDATORS
+        for i, parts in self.stmts:
             # Проверка на метку
             if parts[0].endswith(':'):
                 label = parts[0][:-1]
@@ -119,354 +322,210 @@ class SimpleAssembler:
                 # Игнорируем всё после метки
                 continue
             else:
-                instr = parts[0]
-                if instr not in self.valid_instructions:
-                    print(f"Ошибка (строка {i}): Неизвестная команда '{instr}'")
-                    error_count += 1
-
-                # Проверка синтаксиса команд
-                if instr in ['JMP', 'JZ', 'JNZ']:
-                    if len(parts) != 2:
-                        print(f"Ошибка (строка {i}): {instr} требует 1 операнд (метку)")
-                        error_count += 1
-                    else:
-                        try:
-                            op_type, op_val = self.parse_operand(parts[1])
-                            if op_type != 'label':
-                                print(f"Ошибка (строка {i}): {instr} требует метку, получен {parts[1]}")
-                                error_count += 1
-                        except ValueError as e:
-                            print(f"Ошибка (строка {i}): {e}")
-                            error_count += 1
-
-                elif instr == 'MOV':
-                    if len(parts) != 3:
-                        print(f"Ошибка (строка {i}): MOV требует 2 операнда")
-                        error_count += 1
-                    else:
-                        try:
-                            dest_type, dest_val = self.parse_operand(parts[1])
-                            src_type, src_val = self.parse_operand(parts[2])
-                            # Допустимые комбинации:
-                            # 1. регистр <- регистр/число/память (константа)/память(регистр)
-                            if dest_type == 'reg':
-                                if src_type not in ['reg', 'imm', 'mem', 'mem_reg']:
-                                    print(f"Ошибка (строка {i}): Недопустимый источник для регистра")
-                                    error_count += 1
-                            # 2. память (константа) <- регистр
-                            elif dest_type == 'mem':
-                                if src_type != 'reg':
-                                    print(f"Ошибка (строка {i}): В память можно сохранять только из регистра")
-                                    error_count += 1
-                            # 3. память (регистр) <- регистр или число
-                            elif dest_type == 'mem_reg':
-                                if src_type not in ['reg', 'imm']:
-                                    print(f"Ошибка (строка {i}): В память по адресу из регистра можно сохранять только регистр или число")
-                                    error_count += 1
-                            else:
-                                print(f"Ошибка (строка {i}): Недопустимый приемник MOV")
-                                error_count += 1
-                        except ValueError as e:
-                            print(f"Ошибка (строка {i}): {e}")
-                            error_count += 1
-
-                elif instr == 'CMP':
-                    if len(parts) != 3:
-                        print(f"Ошибка (строка {i}): CMP требует 2 операнда (регистры)")
-                        error_count += 1
-                    else:
-                        try:
-                            op1_type, op1_val = self.parse_operand(parts[1])
-                            op2_type, op2_val = self.parse_operand(parts[2])
-
-                            if op1_type != 'reg' or op2_type != 'reg':
-                                print(f"Ошибка (строка {i}): CMP требует два операнда регистра, получено {parts[1]}, {parts[2]}")
-                                error_count += 1
-                        except ValueError as e:
-                            print(f"Ошибка (строка {i}): {e}")
-                            error_count += 1
-
-                elif instr in ['ADD', 'SUB', 'MUL', 'DIV', 'MOD']:
-                    # 3-адресная модель: ADD Rdest Rsrc1 Rsrc2
-                    if len(parts) != 4:
-                        print(f"Ошибка (строка {i}): {instr} требует 3 операнда: Rdest Rsrc1 Rsrc2")
-                        error_count += 1
-                    else:
-                        try:
-                            # Проверяем операнды
-                            dest_type, dest_val = self.parse_operand(parts[1])
-                            src1_type, src1_val = self.parse_operand(parts[2])
-                            src2_type, src2_val = self.parse_operand(parts[3])
-
-                            # Первый операнд должен быть регистром
-                            if dest_type != 'reg':
-                                print(f"Ошибка (строка {i}): Первый операнд должен быть регистром")
-                                error_count += 1
-
-                            # Второй операнд может быть регистром
-                            if src1_type != 'reg':
-                                print(f"Ошибка (строка {i}): Второй операнд должен быть регистром")
-                                error_count += 1
-
-                            # Третий операнд может быть регистром
-                            if src2_type != 'reg':
-                                print(f"Ошибка (строка {i}): Третий операнд должен быть регистром")
-                                error_count += 1
-
-                            # Для DIV и MOD проверка деления на ноль будет в execute
-
-                        except ValueError as e:
-                            print(f"Ошибка (строка {i}): {e}")
-                            error_count += 1
-
+                # Проверка синтаксиса команды по таблице VALIDATORS
+                error_count += validators.get(parts[0], SimpleAssembler._validate_unknown)(self, parts, i)
                 address += 1
         return error_count == 0
 
+    # ---------- Проверка синтаксиса команд ----------
+    # Каждый метод получает токены строки и ее номер, печатает найденные
+    # ошибки и возвращает их количество.
+
+    def _validate_unknown(self, parts: List[str], i: int) -> int:
+        print(f"Ошибка (строка {i}): Неизвестная команда '{parts[0]}'")
+        return 1
+
+    def _validate_nullary(self, parts: List[str], i: int) -> int:
+        # HLT, NOP: операнды не проверяются
+        return 0
+
+    def _validate_branch(self, parts: List[str], i: int) -> int:
+        instr = parts[0]
+        if len(parts) != 2:
+            print(f"Ошибка (строка {i}): {instr} требует 1 операнд (метку)")
+            return 1
+        try:
+            op_type, op_val = self.parse_operand(parts[1])
+            if op_type != 'label':
+                print(f"Ошибка (строка {i}): {instr} требует метку, получен {parts[1]}")
+                return 1
+        except ValueError as e:
+            print(f"Ошибка (строка {i}): {e}")
+            return 1
+        return 0
+
+    def _validate_mov(self, parts: List[str], i: int) -> int:
+        if len(parts) != 3:
+            print(f"Ошибка (строка {i}): MOV требует 2 операнда")
+            return 1
+        try:
+            dest_type, dest_val = self.parse_operand(parts[1])
+            src_type, src_val = self.parse_operand(parts[2])
+        except ValueError as e:
+            print(f"Ошибка (строка {i}): {e}")
+            return 1
+        # Допустимые комбинации:
+        # 1. регистр <- регистр/число/память (константа)/память(регистр)
+        if dest_type == 'reg':
+            if src_type not in ['reg', 'imm', 'mem', 'mem_reg']:
+                print(f"Ошибка (строка {i}): Недопустимый источник для регистра")
+                return 1
+        # 2. память (константа) <- регистр
+        elif dest_type == 'mem':
+            if src_type != 'reg':
+                print(f"Ошибка (строка {i}): В память можно сохранять только из регистра")
+                return 1
+        # 3. память (регистр) <- регистр или число
+        elif dest_type == 'mem_reg':
+            if src_type not in ['reg', 'imm']:
+                print(f"Ошибка (строка {i}): В память по адресу из регистра можно сохранять только регистр или число")
+                return 1
+        else:
+            print(f"Ошибка (строка {i}): Недопустимый приемник MOV")
+            return 1
+        return 0
+
+    def _validate_cmp(self, parts: List[str], i: int) -> int:
+        if len(parts) != 3:
+            print(f"Ошибка (строка {i}): CMP требует 2 операнда (регистры)")
+            return 1
+        try:
+            op1_type, op1_val = self.parse_operand(parts[1])
+            op2_type, op2_val = self.parse_operand(parts[2])
+        except ValueError as e:
+            print(f"Ошибка (строка {i}): {e}")
+            return 1
+        if op1_type != 'reg' or op2_type != 'reg':
+            print(f"Ошибка (строка {i}): CMP требует два операнда регистра, получено {parts[1]}, {parts[2]}")
+            return 1
+        return 0
+
+    def _validate_arith(self, parts: List[str], i: int) -> int:
+        # 3-адресная модель: ADD Rdest Rsrc1 Rsrc2
+        instr = parts[0]
+        if len(parts) != 4:
+            print(f"Ошибка (строка {i}): {instr} требует 3 операнда: Rdest Rsrc1 Rsrc2")
+            return 1
+        try:
+            dest_type, dest_val = self.parse_operand(parts[1])
+            src1_type, src1_val = self.parse_operand(parts[2])
+            src2_type, src2_val = self.parse_operand(parts[3])
+        except ValueError as e:
+            print(f"Ошибка (строка {i}): {e}")
+            return 1
+        # Все три операнда должны быть регистрами
+        # (для DIV и MOD проверка деления на ноль будет в execute)
+        error_count = 0
+        if dest_type != 'reg':
+            print(f"Ошибка (строка {i}): Первый операнд должен быть регистром")
+            error_count += 1
+        if src1_type != 'reg':
+            print(f"Ошибка (строка {i}): Второй операнд должен быть регистром")
+            error_count += 1
+        if src2_type != 'reg':
+            print(f"Ошибка (строка {i}): Третий операнд должен быть регистром")
+            error_count += 1
+        return error_count
+
+    # Таблица допустимых команд: мнемоника -> проверка синтаксиса
+    VALIDATORS = {
+        'HLT': _validate_nullary, 'NOP': _validate_nullary,                       # Управление
+        'JMP': _validate_branch, 'JZ': _validate_branch, 'JNZ': _validate_branch,
+        'MOV': _validate_mov, 'CMP': _validate_cmp,                               # Пересылки
+        'ADD': _validate_arith, 'SUB': _validate_arith, 'MUL': _validate_arith,   # Арифметика
+        'DIV': _validate_arith, 'MOD': _validate_arith,
+    }
+
     def second_pass(self) -> bool:
         """Второй проход: формирование внутреннего представления"""
         address = 0
         error_count = 0
-        for i, raw_line in enumerate(self.lines, 1):
-            line = self.remove_comments(raw_line)
-            if not line:
-                continue
-            parts = line.split()
-
+        for i, parts in self.stmts:
             # Пропускаем строки с метками
             if parts[0].endswith(':'):
                 continue
             else:
-                # Сохраняем инструкцию с операндами как есть
-                self.instructions.append((address, parts[0], parts[1:]))
+                # Сохраняем инструкцию с операндами как есть (кортеж, для HLT/NOP - пустой)
+                operands = tuple(parts[1:])
+                self.instructions.append((address, parts[0], operands))
+                try:
+                    self.program.append(self.decode_instruction(parts[0], operands))
+                except ValueError as e:
+                    print(f"Ошибка (строка {i}): {e}")
+                    error_count += 1
                 address += 1
+        if error_count == 0 and np is not None:
+            self.native_program = self.encode_program()
         return error_count == 0
 
-    def get_operand_value(self, op_type: str, op_val: Union[int, str]) -> int:
-        """Получение значения операнда"""
-        if op_type == 'reg':
-            return self.registers[op_val]
-        elif op_type == 'imm':
-            return op_val
-        elif op_type == 'mem':
-            return self.memory[op_val]
-        else:
-            raise ValueError(f"Невозможно получить значение для типа {op_type}")
+    def encode_program(self) -> tuple:
+        """Упаковка декодированной программы в массивы для _run_native"""
+        n = len(self.program)
+        opcodes = np.zeros(n, np.int64)
+        arg0 = np.zeros(n, np.int64)
+        arg1 = np.zeros(n, np.int64)
+        arg2 = np.zeros(n, np.int64)
+        for pc, (op, args) in enumerate(self.program):
+            opcodes[pc] = op
+            if op in (OP_JMP, OP_JZ, OP_JNZ):
+                args = args[:1]  # метка нужна только для отладочного вывода
+            for arg, value in zip((arg0, arg1, arg2), args):
+                arg[pc] = value
+        return (opcodes, arg0, arg1, arg2)
+
+    def decode_instruction(self, instr: str, operands: Tuple[str, ...]) -> Tuple[int, tuple]:
+        """
+        Декодирование инструкции во внутреннее представление.
+        Операнды разбираются один раз, при выполнении повторный разбор не нужен:
+        - JMP/JZ/JNZ: (адрес_перехода, метка) - метка разрешается здесь же
+        - MOV: (приемник, источник) - номера регистров, адреса или числа
+        - CMP: (R1, R2)
+        - ADD/SUB/MUL/DIV/MOD: (Rdest, Rsrc1, Rsrc2)
+        - HLT/NOP: ()
+        """
+        if instr == 'MOV':
+            dest_type, dest_val = self.parse_operand(operands[0])
+            src_type, src_val = self.parse_operand(operands[1])
+            opcode = MOV_OPCODES.get((dest_type, src_type))
+            if opcode is None:
+                raise ValueError(f"Недопустимая комбинация MOV: {dest_type} <- {src_type}")
+            return (opcode, (dest_val, src_val))
+        if instr not in SIMPLE_OPCODES:
+            raise ValueError(f"Неизвестная команда '{instr}'")
+        opcode = SIMPLE_OPCODES[instr]
+        if opcode in (OP_HLT, OP_NOP):
+            return (opcode, ())  # операнды HLT/NOP не проверяются и не нужны
+        if opcode in (OP_JMP, OP_JZ, OP_JNZ):
+            label = self.parse_operand(operands[0])[1]
+            if label not in self.labels:
+                raise ValueError(f"Метка '{label}' не найдена")
+            return (opcode, (self.labels[label], label))
+        args = tuple(self.parse_operand(token)[1] for token in operands)
+        return (opcode, args)
 
     def execute(self) -> bool:
         """Базовое выполнение без статистики (для совместимости)"""
-        return self.execute_with_stats(debug=False)
+        return self.execute_with_stats(debug=self.trace)
 
     def execute_with_stats(self, debug: bool = False) -> bool:
         """Выполнение программы с отладочным выводом и сбором статистики"""
-        latency_map = {
-            'MUL': 4,
-            'DIV': 4,
-            'MOD': 4,
-            # остальные по умолчанию 1
-        }
-        
-        if not self.instructions:
+        if not self.program:
             print("Ошибка: Программа не загружена")
             return False
 
         self.pc = 0
         self.running = True
         self.z_flag = False
-        executed_count = 0
-        max_executions = 1000
-        cycles = 0   # для последовательной модели каждый такт = одна инструкция
+        max_executions = self.max_steps
 
         if debug:
             print("\n=== Последовательное выполнение (пошагово) ===")
 
-        while self.running and executed_count < max_executions:
-            if self.pc >= len(self.instructions):
-                print(f"Ошибка: Счётчик команд {self.pc} превысил количество инструкций")
-                break
-
-            addr, instr, operands = self.instructions[self.pc]
-
-            if debug:
-                print(f"\n--- Инструкция {executed_count+1} (адрес {addr}) ---")
-                # print(f"До: PC={self.pc}, Z={self.z_flag}, R={self.registers[:4]}, память[0:4]={self.memory[:4]}")
-
-            try:
-                # --- Код выполнения (аналогично исходному execute) ---
-                if instr == 'HLT':
-                    if debug:
-                        print("  HLT -> останов")
-                    self.running = False
-
-                elif instr == 'NOP':
-                    if debug:
-                        print("  NOP")
-
-                elif instr in ['JMP', 'JZ', 'JNZ']:
-                    if len(operands) != 1:
-                        raise ValueError(f"{instr} требует 1 операнд")
-
-                    op_type, label = self.parse_operand(operands[0])
-                    if op_type != 'label':
-                        raise ValueError(f"{instr} требует метку, получен {operands[0]}")
-                    if label not in self.labels:
-                        raise ValueError(f"Метка '{label}' не найдена")
-                    should_jump = False
-                    if instr == 'JMP':
-                        should_jump = True
-                    elif instr == 'JZ':
-                        should_jump = self.z_flag
-                    elif instr == 'JNZ':
-                        should_jump = not self.z_flag
-                    if should_jump:
-                        self.pc = self.labels[label]
-                        if debug:
-                            print(f"  {instr} -> {label} (адрес {self.pc})")
-                        executed_count += 1
-                        cycles += latency_map.get(instr, 1)
-                        continue
-                    else:
-                        if debug:
-                            print(f"  {instr} -> {label} (условие не выполнено)")
-
-                elif instr == 'MOV':
-                    if len(operands) != 2:
-                        raise ValueError("MOV требует 2 операнда")
-                    dest_type, dest_val = self.parse_operand(operands[0])
-                    src_type, src_val = self.parse_operand(operands[1])
-
-                    if dest_type == 'reg' and src_type == 'reg':
-                        self.registers[dest_val] = self.registers[src_val]
-                        if debug: print(f"  MOV R{dest_val} <- R{src_val} ({self.registers[dest_val]})")
-                    elif dest_type == 'reg' and src_type == 'imm':
-                        self.registers[dest_val] = src_val
-                        if debug: print(f"  MOV R{dest_val} <- {src_val}")
-                    elif dest_type == 'reg' and src_type == 'mem':
-                        self.registers[dest_val] = self.memory[src_val]
-                        if debug: print(f"  MOV R{dest_val} <- [{src_val}] ({self.memory[src_val]})")
-                    elif dest_type == 'reg' and src_type == 'mem_reg':
-                        addr = self.registers[src_val]
-                        self.registers[dest_val] = self.memory[addr]
-                        if debug: print(f"  MOV R{dest_val} <- [R{src_val}] (адрес {addr}) -> {self.registers[dest_val]}")
-                    elif dest_type == 'mem' and src_type == 'reg':
-                        self.memory[dest_val] = self.registers[src_val]
-                        if debug: print(f"  MOV [{dest_val}] <- R{src_val} ({self.registers[src_val]})")
-                    elif dest_type == 'mem_reg' and src_type == 'reg':
-                        addr = self.registers[dest_val]
-                        self.memory[addr] = self.registers[src_val]
-                        if debug: print(f"  MOV [R{dest_val}] <- R{src_val} (адрес {addr}) -> {self.registers[src_val]}")
-                    elif dest_type == 'mem_reg' and src_type == 'imm':
-                        addr = self.registers[dest_val]
-                        self.memory[addr] = src_val
-                        if debug: print(f"  MOV [R{dest_val}] <- {src_val} (адрес {addr})")
-                    else:
-                        raise ValueError(f"Недопустимая комбинация MOV: {dest_type} <- {src_type}")
-
-                elif instr == 'CMP':
-                    if len(operands) != 2:
-                        raise ValueError("CMP требует 2 операнда")
-
-                    op1_type, op1_val = self.parse_operand(operands[0])
-                    op2_type, op2_val = self.parse_operand(operands[1])
-                    if op1_type != 'reg' or op2_type != 'reg':
-                        raise ValueError("CMP требует два регистра")
-                    val1 = self.registers[op1_val]
-                    val2 = self.registers[op2_val]
-                    self.z_flag = (val1 == val2)
-                    if debug:
-                        print(f"  CMP R{op1_val} ({val1}), R{op2_val} ({val2}) -> Z={self.z_flag}")
-
-                elif instr in ['ADD', 'SUB', 'MUL', 'DIV', 'MOD']:
-                    if len(operands) != 3:
-                        raise ValueError(f"{instr} требует 3 операнда")
-
-                    # Парсим операнды
-                    dest_type, dest_val = self.parse_operand(operands[0])
-                    src1_type, src1_val = self.parse_operand(operands[1])
-                    src2_type, src2_val = self.parse_operand(operands[2])
-
-                    # Проверяем типы
-                    if dest_type != 'reg':
-                        raise ValueError("Первый операнд должен быть регистром")
-
-                    if src1_type != 'reg':
-                        raise ValueError("Второй операнд должен быть регистром")
-
-                    if src2_type != 'reg':
-                        raise ValueError("Третий операнд должен быть регистром")
-
-                    # Получаем значения
-                    val1 = self.get_operand_value(src1_type, src1_val)
-                    val2 = self.get_operand_value(src2_type, src2_val)
-
-                    # Выполняем операцию
-                    result = 0
-                    full_result = 0  # Для отладочного вывода
-                    max_num = 0xFFFF
-                    full_result = 0
-                    result = 0
-                    if instr == 'ADD':
-                        # Проверка на переполнение
-                        if max_num - val1 < val2 or (-max_num+1-val1) > val2:
-                            self.running = False
-                            full_result = max_num
-                            if debug:
-                                print(f"  ADD overflow: {val1}+{val2}")
-                        else:
-                            full_result = val1 + val2
-                            result = full_result
-                    elif instr == 'SUB':
-                        # Проверка на переполнение
-                        if val1 < (val2-max_num+1) or (max_num+val2) < val1:
-                            self.running = False
-                            full_result = max_num
-                            if debug:
-                                print(f"  SUB overflow: {val1}-{val2}")
-                        else:
-                            full_result = val1 - val2
-                            result = full_result
-                    elif instr == 'MUL':
-                        if val2 != 0 and ((max_num // val2) < val1 or (val1 < ((-max_num+1) // val2))):
-                            self.running = False
-                            full_result = max_num
-                            if debug:
-                                print(f"  MUL overflow: {val1}*{val2}")
-                        else:
-                            full_result = val1 * val2
-                            result = full_result
-                    elif instr == 'DIV':
-                        if val2 == 0:
-                            raise ValueError("Деление на ноль")
-                        if val1 == -max_num+1 and val2 == -1:
-                            self.running = False
-                            full_result = -max_num
-                            if debug:
-                                print("  DIV overflow")
-                        else:
-                            result = val1 // val2
-                    elif instr == 'MOD':
-                        if val2 == 0:
-                            raise ValueError("MOD: деление на ноль")
-                        result = val1 % val2
-                    self.registers[dest_val] = result
-                    if result <= 0:
-                        self.z_flag = True
-                    if debug:
-                        print(f"  {instr} R{dest_val} <- {result}: {val1}, {val2}")
-
-                else:
-                    raise ValueError(f"Неизвестная команда '{instr}'")
-
-            except (ValueError, IndexError) as e:
-                print(f"Ошибка выполнения (адрес {addr}): {e}")
-                self.running = False
-                break
-
-            # if debug:
-            #     print(f"После: PC={self.pc+1}, Z={self.z_flag}, R={self.registers[:4]}, память[0:4]={self.memory[:4]}")
-
-            self.pc += 1
-            executed_count += 1
-            cycles += latency_map.get(instr, 1)
+        # Без отладочного вывода цикл выполняется скомпилированным кодом
+        if not debug and _run_native is not None and self.native_program is not None:
+            executed_count, cycles = self._execute_native(max_executions)
+        else:
+            executed_count, cycles = self._execute_interpreted(max_executions, debug)
 
         if executed_count >= max_executions:
             print("Ошибка: превышен лимит выполнения (возможно зацикливание)")
@@ -483,12 +542,427 @@ class SimpleAssembler:
         print(f"Flush по переходам:   0")
         return True
 
-    def run(self, filename: str) -> bool:
-        """Полный цикл: загрузка, компиляция и выполнение"""
-        print(f"Загрузка программы из файла: {filename}")
+    def _execute_native(self, max_executions: int) -> Tuple[int, int]:
+        """Выполнение через _run_native. Возвращает (выполнено_инструкций, тактов)"""
+        # Представления numpy над теми же буферами: ядро пишет прямо в регистры и память
+        regs = np.frombuffer(self.registers, np.intc)
+        mem = np.frombuffer(self.memory, np.intc)
+        latency = np.array([LATENCY.get(op, 1) for op in range(OP_MOD + 1)], np.int64)
+        status, pc, executed_count, cycles, z_flag = _run_native(
+            *self.native_program, latency, regs, mem, max_executions)
+
+        self.pc = int(pc)
+        self.z_flag = bool(z_flag)
+        self.running = False
+
+        if status == RUN_PC_OVERFLOW:
+            print(f"Ошибка: Счётчик команд {self.pc} превысил количество инструкций")
+        elif status == RUN_DIV_ZERO:
+            print(f"Ошибка выполнения (адрес {self.pc}): {DIV_ZERO_MESSAGE}")
+        elif status == RUN_MOD_ZERO:
+            print(f"Ошибка выполнения (адрес {self.pc}): {MOD_ZERO_MESSAGE}")
+        elif status == RUN_BAD_ADDRESS:
+            # Адрес еще лежит в регистре: команда прервана до записи результата
+            op, args = self.program[self.pc]
+            addr = self.registers[args[1] if op == OP_MOV_RMR else args[0]]
+            try:
+                self._check_address(addr)
+            except ValueError as e:
+                print(f"Ошибка выполнения (адрес {self.pc}): {e}")
+        return int(executed_count), int(cycles)
+
+    def fuse_program(self) -> Tuple[list, List[int]]:
+        """
+        Слияние пар инструкций в суперинструкции (одна диспетчеризация вместо двух):
+        - MOV R <- число; MOV R <- число  ->  MOV2 (если на вторую нет перехода)
+        - JMP на HLT                         ->  JMP_HLT
+        Адреса переходов пересчитываются под новую нумерацию.
+        Возвращает (программа, исходные_адреса) - исходный адрес для каждой
+        позиции новой программы плюс адрес за ее концом.
+        """
+        program = self.program
+        n = len(program)
+        targets = {args[0] for op, args in program if op in (OP_JMP, OP_JZ, OP_JNZ)}
+        fused = []
+        addresses = []
+        new_pc = [0] * (n + 1)  # исходный адрес -> новый
+        pc = 0
+        while pc < n:
+            op, args = program[pc]
+            new_pc[pc] = len(fused)
+            addresses.append(pc)
+            if (op == OP_MOV_RI and pc + 1 < n and pc + 1 not in targets
+                    and program[pc + 1][0] == OP_MOV_RI):
+                fused.append((OP_MOV2, args + program[pc + 1][1]))
+                pc += 2
+            else:
+                fused.append((op, args))
+                pc += 1
+        new_pc[n] = len(fused)
+        addresses.append(n)
+
+        for i, (op, args) in enumerate(fused):
+            if op in (OP_JMP, OP_JZ, OP_JNZ):
+                target, label = args
+                if op == OP_JMP and target < n and program[target][0] == OP_HLT:
+                    op = OP_JMP_HLT
+                fused[i] = (op, (new_pc[target], label))
+        return fused, addresses
+
+    def _execute_interpreted(self, max_executions: int, debug: bool) -> Tuple[int, int]:
+        """Выполнение через таблицу обработчиков. Возвращает (выполнено_инструкций, тактов)"""
+        self._trace = []
+        pc = self.pc
+        executed_count = 0
+        cycles = 0   # для последовательной модели каждый такт = одна инструкция
+        unfused = True
+        if self.optimize:
+            program, addresses = self.fuse_program()
+            if any(op in FUSED_SIZE for op, _ in program):
+                pc, executed_count, cycles, unfused = self._dispatch_fused(
+                    program, addresses, max_executions, debug)
+        if unfused:
+            pc, steps, step_cycles = self._dispatch(
+                pc, max_executions - executed_count, executed_count, debug)
+            executed_count += steps
+            cycles += step_cycles
+        self.pc = pc
+        self._flush_trace()
+        return executed_count, cycles
+
+    def _handler_table(self) -> list:
+        """Таблица обработчиков в порядке кодов операций OP_*"""
+        return [
+            self._op_hlt, self._op_nop,
+            self._op_jmp, self._op_jz, self._op_jnz,
+            self._op_mov_rr, self._op_mov_ri, self._op_mov_rm, self._op_mov_rmr,
+            self._op_mov_mr, self._op_mov_mrr, self._op_mov_mri,
+            self._op_cmp,
+            self._op_add, self._op_sub, self._op_mul, self._op_div, self._op_mod,
+            self._op_mov2, self._op_jmp_hlt,
+        ]
+
+    def _dispatch(self, pc: int, budget: int, executed_before: int, debug: bool) -> Tuple[int, int, int]:
+        """
+        Цикл выполнения исходной программы с адреса pc, не более budget инструкций.
+        Возвращает (pc, выполнено_инструкций, тактов).
+        """
+        handlers = self._handler_table()
+        latency = [LATENCY.get(op, 1) for op in range(len(handlers))]
+        log = self._trace.append if debug else print
+        executed_count = 0
+        cycles = 0
+
+        # Локальные копии атрибутов: в цикле LOAD_FAST вместо LOAD_ATTR
+        program = self.program
+        n = len(program)
+
+        for _ in range(budget):
+            if pc >= n:
+                log(f"Ошибка: Счётчик команд {pc} превысил количество инструкций")
+                break
+
+            op, args = program[pc]
+
+            if debug:
+                if len(self._trace) >= TRACE_FLUSH_LINES:
+                    self._flush_trace()
+                log(f"\n--- Инструкция {executed_before+executed_count+1} (адрес {pc}) ---")
+
+            try:
+                # Обработчик возвращает адрес следующей инструкции
+                pc = handlers[op](pc, args, debug)
+            except (ValueError, IndexError) as e:
+                log(f"Ошибка выполнения (адрес {pc}): {e}")
+                self.running = False
+                break
+
+            executed_count += 1
+            cycles += latency[op]
+            if not self.running:
+                break
+
+        return pc, executed_count, cycles
+
+    def _dispatch_fused(self, program: list, addresses: List[int], budget: int,
+                        debug: bool) -> Tuple[int, int, int, bool]:
+        """
+        Цикл выполнения программы с суперинструкциями (см. fuse_program).
+        Лимит считается в исходных инструкциях (суперинструкция - две). Если
+        суперинструкция не помещается в остаток лимита, цикл прерывается, чтобы
+        остаток выполнился по исходной программе и останов совпал с выполнением
+        без слияния. Возвращает (исходный pc, выполнено_инструкций, тактов,
+        нужно_ли_продолжить_по_исходной_программе).
+        """
+        handlers = self._handler_table()
+        latency = [LATENCY.get(op, 1) for op in range(len(handlers))]
+        size = [FUSED_SIZE.get(op, 1) for op in range(len(handlers))]
+        log = self._trace.append if debug else print
+        executed_count = 0
+        cycles = 0
+        n = len(program)
+        pc = 0
+
+        while executed_count < budget:
+            if pc >= n:
+                log(f"Ошибка: Счётчик команд {addresses[pc]} превысил количество инструкций")
+                break
+
+            op, args = program[pc]
+            if size[op] > budget - executed_count:
+                return addresses[pc], executed_count, cycles, True
+
+            if debug:
+                if len(self._trace) >= TRACE_FLUSH_LINES:
+                    self._flush_trace()
+                log(f"\n--- Инструкция {executed_count+1} (адрес {addresses[pc]}) ---")
+
+            try:
+                pc = handlers[op](pc, args, debug)
+            except (ValueError, IndexError) as e:
+                log(f"Ошибка выполнения (адрес {addresses[pc]}): {e}")
+                self.running = False
+                break
+
+            executed_count += size[op]
+            cycles += latency[op]
+            if not self.running:
+                break
+
+        return addresses[pc], executed_count, cycles, False
+
+    def _flush_trace(self) -> None:
+        """Вывод накопленной трассировки (список очищается на месте, log остается валиден)"""
+        if self._trace:
+            sys.stdout.write('\n'.join(self._trace) + '\n')
+            self._trace.clear()
+
+    # ---------- Обработчики команд ----------
+    # Каждый обработчик получает адрес инструкции и декодированные операнды
+    # и возвращает адрес следующей инструкции. Трассировка (debug) не печатается
+    # сразу, а накапливается в self._trace и выводится после цикла.
+
+    def _op_hlt(self, pc: int, args: tuple, debug: bool) -> int:
+        if debug:
+            self._trace.append("  HLT -> останов")
+        self.running = False
+        return pc + 1
+
+    def _op_nop(self, pc: int, args: tuple, debug: bool) -> int:
+        if debug:
+            self._trace.append("  NOP")
+        return pc + 1
+
+    def _branch(self, instr: str, pc: int, args: tuple, taken: bool, debug: bool) -> int:
+        """Общая часть JMP/JZ/JNZ (адрес перехода разрешен при компиляции)"""
+        target, label = args
+        if taken:
+            if debug:
+                self._trace.append(f"  {instr} -> {label} (адрес {self.labels[label]})")
+            return target
+        if debug:
+            self._trace.append(f"  {instr} -> {label} (условие не выполнено)")
+        return pc + 1
+
+    def _op_jmp(self, pc: int, args: tuple, debug: bool) -> int:
+        if debug:
+            self._trace.append(f"  JMP -> {args[1]} (адрес {self.labels[args[1]]})")
+        return args[0]
+
+    def _op_jz(self, pc: int, args: tuple, debug: bool) -> int:
+        return self._branch('JZ', pc, args, self.z_flag, debug)
+
+    def _op_jnz(self, pc: int, args: tuple, debug: bool) -> int:
+        return self._branch('JNZ', pc, args, not self.z_flag, debug)
+
+    def _op_mov_rr(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src = args
+        self.registers[dest] = self.registers[src]
+        if debug: self._trace.append(f"  MOV R{dest} <- R{src} ({self.registers[dest]})")
+        return pc + 1
+
+    def _op_mov_ri(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, value = args
+        self.registers[dest] = value
+        if debug: self._trace.append(f"  MOV R{dest} <- {value}")
+        return pc + 1
+
+    def _op_mov_rm(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src = args
+        self.registers[dest] = self.memory[src]
+        if debug: self._trace.append(f"  MOV R{dest} <- [{src}] ({self.memory[src]})")
+        return pc + 1
+
+    def _check_address(self, addr: int) -> int:
+        """Проверка адреса памяти, взятого из регистра (отрицательные - от конца, как индекс)"""
+        if not -len(self.memory) <= addr < len(self.memory):
+            raise ValueError(f"Адрес памяти {addr} вне диапазона (0-{len(self.memory) - 1})")
+        return addr
+
+    def _op_mov_rmr(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src = args
+        addr = self._check_address(self.registers[src])
+        self.registers[dest] = self.memory[addr]
+        if debug: self._trace.append(f"  MOV R{dest} <- [R{src}] (адрес {addr}) -> {self.registers[dest]}")
+        return pc + 1
+
+    def _op_mov_mr(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src = args
+        self.memory[dest] = self.registers[src]
+        if debug: self._trace.append(f"  MOV [{dest}] <- R{src} ({self.registers[src]})")
+        return pc + 1
+
+    def _op_mov_mrr(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src = args
+        addr = self._check_address(self.registers[dest])
+        self.memory[addr] = self.registers[src]
+        if debug: self._trace.append(f"  MOV [R{dest}] <- R{src} (адрес {addr}) -> {self.registers[src]}")
+        return pc + 1
+
+    def _op_mov_mri(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, value = args
+        addr = self._check_address(self.registers[dest])
+        self.memory[addr] = value
+        if debug: self._trace.append(f"  MOV [R{dest}] <- {value} (адрес {addr})")
+        return pc + 1
+
+    def _op_cmp(self, pc: int, args: tuple, debug: bool) -> int:
+        r1, r2 = args
+        val1 = self.registers[r1]
+        val2 = self.registers[r2]
+        self.z_flag = (val1 == val2)
+        if debug:
+            self._trace.append(f"  CMP R{r1} ({val1}), R{r2} ({val2}) -> Z={self.z_flag}")
+        return pc + 1
+
+    def _op_mov2(self, pc: int, args: tuple, debug: bool) -> int:
+        dest0, value0, dest1, value1 = args
+        self.registers[dest0] = value0
+        self.registers[dest1] = value1
+        if debug:
+            self._trace.append(f"  MOV R{dest0} <- {value0}")
+            self._trace.append(f"  MOV R{dest1} <- {value1}")
+        return pc + 1
+
+    def _op_jmp_hlt(self, pc: int, args: tuple, debug: bool) -> int:
+        target, label = args
+        if debug:
+            self._trace.append(f"  JMP -> {label} (адрес {self.labels[label]})")
+            self._trace.append("  HLT -> останов")
+        self.running = False
+        return target + 1
+
+    def _write_result(self, instr: str, dest: int, result: int, val1: int, val2: int, debug: bool) -> None:
+        """Общая часть арифметических команд: запись результата и флага Z"""
+        self.registers[dest] = result
+        if result <= 0:
+            self.z_flag = True
+        if debug:
+            self._trace.append(f"  {instr} R{dest} <- {result}: {val1}, {val2}")
+
+    def _op_add(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src1, src2 = args
+        val1 = self.registers[src1]
+        val2 = self.registers[src2]
+        result = 0
+        # Проверка на переполнение
+        if 0xFFFF - val1 < val2 or (-0xFFFF+1-val1) > val2:
+            self.running = False
+            if debug:
+                self._trace.append(f"  ADD overflow: {val1}+{val2}")
+        else:
+            result = val1 + val2
+        self._write_result('ADD', dest, result, val1, val2, debug)
+        return pc + 1
+
+    def _op_sub(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src1, src2 = args
+        val1 = self.registers[src1]
+        val2 = self.registers[src2]
+        result = 0
+        # Проверка на переполнение
+        if val1 < (val2-0xFFFF+1) or (0xFFFF+val2) < val1:
+            self.running = False
+            if debug:
+                self._trace.append(f"  SUB overflow: {val1}-{val2}")
+        else:
+            result = val1 - val2
+        self._write_result('SUB', dest, result, val1, val2, debug)
+        return pc + 1
+
+    def _op_mul(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src1, src2 = args
+        val1 = self.registers[src1]
+        val2 = self.registers[src2]
+        result = 0
+        if val2 != 0 and ((0xFFFF // val2) < val1 or (val1 < ((-0xFFFF+1) // val2))):
+            self.running = False
+            if debug:
+                self._trace.append(f"  MUL overflow: {val1}*{val2}")
+        else:
+            result = val1 * val2
+        self._write_result('MUL', dest, result, val1, val2, debug)
+        return pc + 1
+
+    def _op_div(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src1, src2 = args
+        val1 = self.registers[src1]
+        val2 = self.registers[src2]
+        result = 0
+        if val2 == 0:
+            raise ValueError(DIV_ZERO_MESSAGE)
+        if val1 == -0xFFFF+1 and val2 == -1:
+            self.running = False
+            if debug:
+                self._trace.append("  DIV overflow")
+        else:
+            result = val1 // val2
+        self._write_result('DIV', dest, result, val1, val2, debug)
+        return pc + 1
+
+    def _op_mod(self, pc: int, args: tuple, debug: bool) -> int:
+        dest, src1, src2 = args
+        val1 = self.registers[src1]
+        val2 = self.registers[src2]
+        if val2 == 0:
+            raise ValueError(MOD_ZERO_MESSAGE)
+        result = val1 % val2
+        self._write_result('MOD', dest, result, val1, val2, debug)
+        return pc + 1
+
+    def assemble(self, filename: str) -> bool:
+        """
+        Загрузка и компиляция программы (оба прохода).
+        Если файл не менялся (совпадают время изменения и размер), результат
+        берется из кэша в памяти или из файла <программа>.asm-cache.json.
+        """
+        key = None
+        if self.use_cache:
+            try:
+                st = os.stat(filename)
+                key = (os.path.abspath(filename), st.st_mtime_ns, st.st_size)
+            except OSError:
+                pass  # об ошибке сообщит load_program
+        if key is not None:
+            compiled = _COMPILE_CACHE.get(key) or self._load_compiled(filename, key)
+            if compiled is not None:
+                _COMPILE_CACHE[key] = compiled
+                line_count, labels, instructions, program = compiled
+                self.line_count = line_count
+                self.labels = dict(labels)
+                self.instructions = list(instructions)
+                self.program = list(program)
+                if np is not None:
+                    self.native_program = self.encode_program()
+                print(f"Загружено строк: {self.line_count}")
+                print("Программа не изменялась, используется результат компиляции из кэша")
+                print(f"Найдено меток: {len(self.labels)}")
+                print(f"Сформировано инструкций: {len(self.instructions)}")
+                return True
+
         if not self.load_program(filename):
             return False
-        print(f"Загружено строк: {len(self.lines)}")
+        print(f"Загружено строк: {self.line_count}")
         print("Первый проход: сбор меток и проверка синтаксиса...")
         if not self.first_pass():
             print("Ошибка компиляции: обнаружены синтаксические ошибки")
@@ -499,6 +973,48 @@ class SimpleAssembler:
             print("Ошибка при формировании внутреннего представления")
             return False
         print(f"Сформировано инструкций: {len(self.instructions)}")
+
+        if key is not None:
+            compiled = (self.line_count, dict(self.labels), list(self.instructions), list(self.program))
+            _COMPILE_CACHE[key] = compiled
+            self._save_compiled(filename, key, compiled)
+        return True
+
+    def _load_compiled(self, filename: str, key: tuple):
+        """Чтение результата компиляции из файла кэша (None, если он устарел или поврежден)"""
+        # Файл хранится в JSON (не pickle): его содержимое - только данные,
+        # чтение подложенного файла не может выполнить код
+        try:
+            with open(filename + COMPILE_CACHE_SUFFIX, 'r', encoding='utf-8') as file:
+                version, mtime_ns, size, line_count, labels, instructions, program = json.load(file)
+            if (version, mtime_ns, size) != (COMPILE_CACHE_VERSION, key[1], key[2]):
+                return None
+            # JSON возвращает списки - восстанавливаем кортежи внутреннего представления
+            program = [(int(op), tuple(args)) for op, args in program]
+            # Файл мог быть испорчен или подложен: такая программа упала бы при выполнении
+            if len(instructions) != len(program) or not _is_valid_program(program):
+                return None
+            return (int(line_count),
+                    {str(label): int(addr) for label, addr in labels.items()},
+                    [(int(addr), str(instr), tuple(map(str, operands)))
+                     for addr, instr, operands in instructions],
+                    program)
+        except (OSError, ValueError, TypeError, AttributeError):
+            return None
+
+    def _save_compiled(self, filename: str, key: tuple, compiled: tuple) -> None:
+        """Сохранение результата компиляции в файл кэша (ошибки записи игнорируются)"""
+        try:
+            with open(filename + COMPILE_CACHE_SUFFIX, 'w', encoding='utf-8') as file:
+                json.dump((COMPILE_CACHE_VERSION, key[1], key[2], *compiled), file, ensure_ascii=False)
+        except OSError:
+            pass
+
+    def run(self, filename: str) -> bool:
+        """Полный цикл: загрузка, компиляция и выполнение"""
+        print(f"Загрузка программы из файла: {filename}")
+        if not self.assemble(filename):
+            return False
         print("\n--- Начало выполнения ---")
         result = self.execute()
         print("--- Конец выполнения ---")
@@ -519,15 +1035,37 @@ class SimpleAssembler:
         print(f"Память (первые 10 ячеек): {[self.memory[i] for i in range(10)]}")
         print(f"Метки: {self.labels}")
 
+def _max_steps_arg(value: str) -> int:
+    """Тип аргумента --max-steps: целое от 1 до 2**63-1 (счетчик шагов в JIT - int64)"""
+    try:
+        steps = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"ожидается целое число: {value}") from None
+    if not 1 <= steps <= 2**63 - 1:
+        raise argparse.ArgumentTypeError(f"лимит должен быть от 1 до {2**63 - 1}: {value}")
+    return steps
+
 def main():
     """Главная функция"""
-    if len(sys.argv) < 2:
-        print("Использование: python interpreter.py <файл_программы>")
-        print("Пример: python interpreter.py program.txt")
-        return
-    filename = sys.argv[1]
-    asm = SimpleAssembler()
-    success = asm.run(filename)
+    parser = argparse.ArgumentParser(
+        description="Интерпретатор псевдо-ассемблера",
+        epilog="Пример: python interpreter.py program.txt --trace")
+    parser.add_argument("filename", help="файл программы")
+    parser.add_argument("--trace", action="store_true",
+                        help="пошаговый вывод выполнения (медленнее, без JIT)")
+    parser.add_argument("-O", "--optimize", action="store_true",
+                        help="слияние инструкций в суперинструкции (для выполнения без JIT)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"не использовать кэш компиляции (файл <программа>{COMPILE_CACHE_SUFFIX})")
+    parser.add_argument("--max-steps", type=_max_steps_arg, default=10_000_000, metavar="N",
+                        help="лимит выполненных инструкций, после которого программа "
+                             "считается зациклившейся (по умолчанию %(default)s)")
+    args = parser.parse_args()
+    asm = SimpleAssembler(max_steps=args.max_steps)
+    asm.trace = args.trace
+    asm.optimize = args.optimize
+    asm.use_cache = not args.no_cache
+    success = asm.run(args.filename)
     if success:
         print("\nПрограмма выполнена успешно!")
         asm.print_state()
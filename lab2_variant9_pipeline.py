@@ -1,4 +1,5 @@
 import sys
+from array import array
 from dataclasses import dataclass
 from typing import List, Optional, Set, Tuple, Union
 from interpreter import SimpleAssembler
@@ -9,7 +10,7 @@ class PipelineInstruction:
     """Состояние одной инструкции в конвейере."""
     addr: int
     instr: str
-    operands: List[str]
+    operands: Tuple[str, ...]
     stage: StageName
     reads: Set[Tuple[str, Union[int, str]]]
     writes: Set[Tuple[str, Union[int, str]]]
@@ -31,7 +32,9 @@ class PipelineSimulator(SimpleAssembler):
     STAGES: List[StageName] = ["IF", "ID", "EX", "MEM", "WB"]
 
     def __init__(self):
-        super().__init__()
+        # Последовательный режим здесь всегда пошаговый, поэтому сохраняется
+        # прежний небольшой лимит инструкций
+        super().__init__(max_steps=1000)
         self.cycle_count: int = 0
         self.commit_count: int = 0
         self.data_stalls: int = 0
@@ -40,7 +43,7 @@ class PipelineSimulator(SimpleAssembler):
         self.ex_stalls: int = 0  # задержки из-за занятости EX
 
     # ---------- Вспомогательные методы ----------
-    def _analyze_instruction(self, addr: int, instr: str, operands: List[str]) -> PipelineInstruction:
+    def _analyze_instruction(self, addr: int, instr: str, operands: Tuple[str, ...]) -> PipelineInstruction:
         """
         Построение формальных множеств R(I), W(I) и признаков ветвления
         для инструкции 
@@ -105,15 +108,9 @@ class PipelineSimulator(SimpleAssembler):
                 reads.add(reg_obj(src2_val))
             writes.add(("flag", "Z"))
         elif instr in {"JMP", "JZ", "JNZ"}:
-            if len(operands) != 1:
-                raise ValueError(f"{instr} требует 1 операнд")
-            op_type, op_val = self.parse_operand(operands[0])
-            if op_type != "label":
-                raise ValueError(f"{instr} требует метку, получен {operands[0]}")
-            if op_val not in self.labels:
-                raise ValueError(f"Метка '{op_val}' не найдена")
+            # Метка проверена и разрешена в адрес при втором проходе
             is_branch = True
-            branch_target = self.labels[op_val]
+            branch_target = self.program[addr][1][0]
             if instr in {"JZ", "JNZ"}:
                 reads.add(("flag", "Z"))
         else:
@@ -353,8 +350,8 @@ class PipelineSimulator(SimpleAssembler):
         self.pc = 0
         self.running = True
         self.z_flag = False
-        self.registers = [0] * len(self.registers)
-        self.memory = [0] * len(self.memory)
+        self.registers = array('i', [0] * len(self.registers))
+        self.memory = array('i', [0] * len(self.memory))
         self.cycle_count = 0
         self.commit_count = 0
         self.data_stalls = 0
@@ -585,19 +582,8 @@ def main(filename: str = "program.txt", mode: str = "seq"):
 
     asm = PipelineSimulator()
     print(f"Загрузка программы из файла: {filename}")
-    if not asm.load_program(filename):
+    if not asm.assemble(filename):
         return
-    print(f"Загружено строк: {len(asm.lines)}")
-    print("Первый проход: сбор меток и проверка синтаксиса...")
-    if not asm.first_pass():
-        print("Ошибка компиляции: обнаружены синтаксические ошибки")
-        return
-    print(f"Найдено меток: {len(asm.labels)}")
-    print("Второй проход: формирование внутреннего представления...")
-    if not asm.second_pass():
-        print("Ошибка при формировании внутреннего представления")
-        return
-    print(f"Сформировано инструкций: {len(asm.instructions)}")
 
     if mode == "seq":
         result = asm.execute_with_stats(debug)